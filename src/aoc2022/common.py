@@ -1,31 +1,92 @@
 from __future__ import annotations
-from typing import Iterable, NamedTuple
-import traceback
-import inspect
+from typing import Iterable, Iterator, NamedTuple
+import mmap
+import sys
 from textwrap import dedent
 
 
-def _line_iter(path: str) -> Iterable[str]:
+def _map(path: str) -> mmap.mmap | bytes:
+    with open(path, "rb") as f:
+        try:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # can't map an empty file
+            return b""
+
+
+BYTE_LINES_CHUNK_SIZE = 1024 * 1024
+
+
+def lines(path: str, strip: bool = True) -> Iterator[str]:
+    """
+    Every line of the file, read as it's iterated, so huge files are fine.
+    Lines are stripped of surrounding whitespace, or just the line ending if not `strip`.
+
+    Plain file iteration already splits lines in C, which beats mapping the file
+    and splitting it up from python (see `bench_lines`).
+    """
     with open(path) as f:
-        for line in f:
-            yield line.strip()
+        if strip:
+            for line in f:
+                yield line.strip()
+        else:
+            for line in f:
+                yield line.removesuffix("\n")
+
+
+def byte_lines(path: str, chunk_size: int = BYTE_LINES_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Every line of the file, without its line ending, undecoded.
+    The mapped file is split a chunk at a time with bytes.split,
+    so it's split in C while only holding one chunk's worth of lines.
+    """
+    mapped = _map(path)
+    partial = b""
+    for start in range(0, len(mapped), chunk_size):
+        data = partial + mapped[start : start + chunk_size]
+        if b"\r" in data:
+            data = data.replace(b"\r\n", b"\n")
 
+        # the last piece might carry on into the next chunk
+        *complete, partial = data.split(b"\n")
+        yield from complete
 
-def input(day: int | None = None) -> Iterable[str]:
+    if partial:
+        yield partial
+
+
+def buffer(path: str) -> memoryview:
+    "The whole file as a read-only view of the mapped file."
+    return memoryview(_map(path))
+
+
+def _caller_day(depth: int) -> int:
+    # only looks at the one frame, unlike traceback.extract_stack()
+    caller_mod_name = sys._getframe(depth + 1).f_globals["__name__"]
+    try:
+        return int(caller_mod_name.rpartition(".")[2].removeprefix("day"))
+    except ValueError:
+        raise RuntimeError(f"can't get day from caller module {caller_mod_name}")
+
+
+def input_path(day: int | None = None) -> str:
+    "Path of the input for the given day, or the calling module's day."
     if day is None:
-        stack = traceback.extract_stack()
-        caller = stack[-2]
-        caller_mod_name = inspect.getmodulename(caller.filename)
-        if caller_mod_name is None:
-            raise RuntimeError(
-                f"can't get module name for caller at {caller.filename=}"
-            )
-        day = int(caller_mod_name.lstrip("day"))
+        day = _caller_day(1)
+    return f"inputs/day{day}.txt"
+
 
-    # a separate function / generator so the traceback or error is more predictable
-    return _line_iter(f"inputs/day{day}.txt")
+def input(day: int | None = None, strip: bool = True) -> Iterable[str]:
+    return lines(input_path(day if day is not None else _caller_day(1)), strip)
 
 
+def input_buffer(day: int | None = None) -> memoryview:
+    return buffer(input_path(day if day is not None else _caller_day(1)))
+
+
+def input_byte_lines(day: int | None = None) -> Iterator[bytes]:
+    return byte_lines(input_path(day if day is not None else _caller_day(1)))
+
 
 # COORDINATE SYSTEM:
 # y / row-major, with the top being 0
@@ -49,4 +110,78 @@ class Vector(NamedTuple):
         ox, oy = other
         return Vector(x - ox, y - oy)
 
-__all__ = ["input", "dedent"]
+def bench_lines(line_count: int = 2_000_000):
+    """
+    Time each way of reading the same file, against plain open() and strip(),
+    plus reading it whole with one read() call or one mapping.
+    """
+    import os
+    import tempfile
+    import time
+
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+        f.writelines(f"{i} {i * 7}\n" for i in range(0, line_count))
+    path = f.name
+
+    def plain() -> int:
+        with open(path) as f:
+            return sum(1 for _line in (line.strip() for line in f))
+
+    def read_whole() -> int:
+        with open(path, "rb") as f:
+            return f.read().count(b"\n")
+
+    ways = {
+        "open() + strip()": plain,
+        "lines()": lambda: sum(1 for _line in lines(path)),
+        "byte_lines()": lambda: sum(1 for _line in byte_lines(path)),
+        "one read()": read_whole,
+        "buffer()": lambda: bytes(buffer(path)).count(b"\n"),
+    }
+
+    try:
+        for name, way in ways.items():
+            start = time.perf_counter()
+            count = way()
+            elapsed = time.perf_counter() - start
+            assert count == line_count
+            print(f"{name}: {elapsed:.3f}s")
+    finally:
+        os.remove(path)
+
+
+def test_lines():
+    import os
+    import tempfile
+
+    cases = {
+        b"": ([], [], []),
+        b"a b\n c\n": (["a b", "c"], ["a b", " c"], [b"a b", b" c"]),
+        b"a\r\n\r\nb": (["a", "", "b"], ["a", "", "b"], [b"a", b"", b"b"]),
+        b"a\n\nb\n": (["a", "", "b"], ["a", "", "b"], [b"a", b"", b"b"]),
+    }
+    for data, (stripped, unstripped, raw) in cases.items():
+        with tempfile.NamedTemporaryFile(suffix=".txt", delete=False) as f:
+            f.write(data)
+        try:
+            assert list(lines(f.name)) == stripped
+            assert list(lines(f.name, strip=False)) == unstripped
+            assert bytes(buffer(f.name)) == data
+
+            # small enough chunks that lines and \r\n pairs straddle them
+            for chunk_size in (1, 2, 3, BYTE_LINES_CHUNK_SIZE):
+                assert list(byte_lines(f.name, chunk_size)) == raw
+        finally:
+            os.remove(f.name)
+
+
+__all__ = [
+    "input",
+    "input_path",
+    "input_buffer",
+    "input_byte_lines",
+    "lines",
+    "byte_lines",
+    "buffer",
+    "dedent",
+]
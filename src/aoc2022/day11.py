@@ -1,13 +1,31 @@
+from __future__ import annotations
+
+import math
 import operator
 import re
 import sys
-from collections import deque
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from dataclasses import dataclass, field
+from enum import Enum
+from functools import partial
 from io import StringIO
-from typing import Callable, Iterable, NamedTuple, TextIO, TypeAlias
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Iterable,
+    Iterator,
+    NamedTuple,
+    TextIO,
+    TypeAlias,
+)
 
 from aoc2022.common import input
 
+if TYPE_CHECKING:
+    import numpy as np
+
 
 class Targets(NamedTuple):
     true: int
@@ -23,7 +41,8 @@ class InspectionResult(NamedTuple):
 
 
 Operation: TypeAlias = Callable[[int], int]
-TestFunc: TypeAlias = Callable[[int], bool]
+Inspection: TypeAlias = Callable[[int], tuple[int, bool]]
+"new worry level, and whether it passed the test"
 
 
 @dataclass
@@ -31,18 +50,35 @@ class Monke:
     worry_divisor: int
     id: int
     items: deque[int]
-    operation: Operation
-    test: TestFunc
+    op: OpSpec
     targets: Targets
+    divisor: int
+    "what the test checks divisibility by"
+
+    operation: Operation = field(init=False, repr=False)
+    inspection: Inspection = field(init=False, repr=False)
+
+    worry_modulus: int | None = field(init=False, default=None)
+    "if set (with `bound_to`), worry levels are kept modulo this after each inspection"
 
     inspection_count: int = field(init=False, default=0)
 
+    def __post_init__(self):
+        self.operation = self.op.compile()
+        self.inspection = self.op.compile_inspection(self.divisor, self.worry_divisor)
+
+    def bound_to(self, modulus: int):
+        self.worry_modulus = modulus
+        self.inspection = self.op.compile_inspection(
+            self.divisor, self.worry_divisor, modulus
+        )
+
     def __str__(self):
         return f"""
         Monkey {self.id}:
           Starting items: {", ".join(str(item) for item in self.items)}
-          Operation: new = {self.operation}
-          Test: {self.test}
+          Operation: new = {self.op}
+          Test: divisible by {self.divisor}
             If true: throw to monkey {self.targets.true}
             If false: throw to monkey {self.targets.false}
         """
@@ -64,62 +100,228 @@ class Monke:
             worry_divisor,
             id,
             starting_items,
-            compile_op(op_spec),
-            compile_test(test_num),
+            OpSpec.parse(op_spec),
             Targets(true, false),
+            test_num,
         )
 
+    def inspect(self, item: int) -> InspectionResult:
+        """
+        Work out where an item goes, without touching this monkey's state.
+        """
+        item, result = self.inspection(item)
+        target = self.targets.to(result)
+
+        return InspectionResult(item, target)
+
+    def inspect_batch(self, items: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Inspect a whole array of items at once.
+        Returns the items thrown to the true and false targets, in their original order.
+        """
+        items, passed = self.inspection(items)
+
+        return items[passed], items[~passed]
+
     def inspect_one(self) -> InspectionResult | None:
         try:
             item = self.items.popleft()
         except IndexError:
             return None
 
-        item = self.operation(item)
-        item //= self.worry_divisor
-
-        result = self.test(item)
-        target = self.targets.to(result)
-
         self.inspection_count += 1
 
-        return InspectionResult(item, target)
+        return self.inspect(item)
 
     def take_turn(self) -> Iterable[InspectionResult]:
         while (result := self.inspect_one()) is not None:
             yield result
 
 
-TOKEN_TO_OP: dict[str, Callable[[int, int], int]] = {
-    "+": operator.add,
-    "/": operator.floordiv,
-    "-": operator.sub,
-    "*": operator.mul,
-}
-OLD = "old"
+class OpKind(Enum):
+    ADD = "+"
+    MULTIPLY = "*"
+    SQUARE = "* old"
+    FLOOR_DIVIDE = "/"
 
 
-def compile_op(op_spec: str) -> Operation:
-    left, op_token, right = op_spec.strip().split()
-    op = TOKEN_TO_OP[op_token]
+class OpSpec(NamedTuple):
+    """
+    A parsed operation: `old + constant`, `old * constant`, `old * old`,
+    or `old / constant` (rounding down).
+    `old - constant` is read as adding the negative.
+    """
 
-    def _test(item: int) -> int:
-        l = item if left == OLD else int(left)
-        r = item if right == OLD else int(right)
-        return op(l, r)
+    kind: OpKind
+    constant: int = 0
+    "unused for SQUARE"
 
-    _test.__str__ = lambda self: op_spec
+    @classmethod
+    def parse(cls, op_spec: str) -> OpSpec:
+        match op_spec.strip().split():
+            case "old", "*", "old":
+                return cls(OpKind.SQUARE)
+            case "old", "+", "old":
+                return cls(OpKind.MULTIPLY, 2)
+            case ("old", "+", constant) | (constant, "+", "old"):
+                return cls(OpKind.ADD, int(constant))
+            case "old", "-", constant:
+                return cls(OpKind.ADD, -int(constant))
+            case ("old", "*", constant) | (constant, "*", "old"):
+                return cls(OpKind.MULTIPLY, int(constant))
+            case "old", "/", constant:
+                return cls(OpKind.FLOOR_DIVIDE, int(constant))
+            case _:
+                raise ValueError(f"unsupported operation: {op_spec}")
+
+    def compile(self) -> Operation:
+        """
+        A callable specialized to this operation, with the constant already bound.
+        Works on numpy arrays as well as ints.
+        """
+        match self.kind:
+            case OpKind.ADD:
+                return partial(operator.add, self.constant)
+            case OpKind.MULTIPLY:
+                return partial(operator.mul, self.constant)
+            case OpKind.SQUARE:
+                return lambda item: item * item
+            case OpKind.FLOOR_DIVIDE:
+                constant = self.constant
+                return lambda item: item // constant
+
+    def compile_inspection(
+        self, divisor: int, worry_divisor: int = 1, worry_modulus: int | None = None
+    ) -> Inspection:
+        """
+        A whole inspection as one callable: this operation, dividing down and bounding
+        the worry, then the test for divisibility by `divisor`.
+        Steps that would do nothing are left out rather than checked for each item.
+        Works on numpy arrays as well as ints.
+        """
+        operation = self.compile()
+
+        match worry_divisor, worry_modulus:
+            case 1, None:
+
+                def inspection(item: int) -> tuple[int, bool]:
+                    item = operation(item)
+                    return item, item % divisor == 0
+
+            case _, None:
+
+                def inspection(item: int) -> tuple[int, bool]:
+                    item = operation(item) // worry_divisor
+                    return item, item % divisor == 0
+
+            case 1, modulus:
+
+                def inspection(item: int) -> tuple[int, bool]:
+                    item = operation(item) % modulus
+                    return item, item % divisor == 0
+
+            case _, modulus:
+
+                def inspection(item: int) -> tuple[int, bool]:
+                    item = operation(item) // worry_divisor % modulus
+                    return item, item % divisor == 0
+
+        return inspection
+
+    def __str__(self):
+        if self.kind is OpKind.SQUARE:
+            return "old * old"
+        return f"old {self.kind.value} {self.constant}"
 
-    return _test
 
+class ItemState(NamedTuple):
+    monke_id: int
+    item: int
+
+
+def item_round(monkeys: list[Monke], state: ItemState) -> tuple[ItemState, list[int]]:
+    """
+    Follow a single item through one round.
+    Returns where it ends up and the ids of every monkey that inspected it along the way.
+    """
+    monke_id, item = state
+    inspected_by: list[int] = []
 
-def compile_test(divisor: int) -> TestFunc:
-    def _check(item: int) -> bool:
-        return (item % divisor) == 0
+    while True:
+        inspected_by.append(monke_id)
+        item, target = monkeys[monke_id].inspect(item)
 
-    _check.__str__ = lambda self: f"divisible by {divisor}"
+        # thrown to a monkey that already went this round, so it waits for the next
+        if target < monke_id:
+            return ItemState(target, item), inspected_by
 
-    return _check
+        monke_id = target
+
+
+@dataclass
+class ItemTrajectory:
+    """
+    The rounds-by-round path of one item, up to the point it starts repeating.
+    """
+
+    monke_count: int
+
+    states: list[ItemState]
+    "the item's state at the start of each round"
+
+    inspected_by: list[list[int]]
+    "who inspected it during each round"
+
+    cycle_start: int | None
+    "the round the cycle starts repeating from, if one was found"
+
+    @classmethod
+    def follow(cls, monkeys: list[Monke], start: ItemState, max_rounds: int):
+        seen: dict[ItemState, int] = {}
+        states: list[ItemState] = []
+        inspected_by: list[list[int]] = []
+
+        state = start
+        cycle_start = None
+        while len(states) <= max_rounds:
+            if (cycle_start := seen.get(state)) is not None:
+                break
+
+            seen[state] = len(states)
+            states.append(state)
+
+            state, by = item_round(monkeys, state)
+            inspected_by.append(by)
+
+        return cls(len(monkeys), states, inspected_by, cycle_start)
+
+    def _counts(self, rounds: range) -> list[int]:
+        counts = [0] * self.monke_count
+        for round in rounds:
+            for monke_id in self.inspected_by[round]:
+                counts[monke_id] += 1
+        return counts
+
+    def after(self, rounds: int) -> tuple[ItemState, list[int]]:
+        """
+        Where the item is and how many times each monkey inspected it after the given rounds.
+        """
+        if self.cycle_start is None or rounds < len(self.states):
+            return self.states[rounds], self._counts(range(0, rounds))
+
+        cycle_len = len(self.states) - self.cycle_start
+        full_cycles, partial = divmod(rounds - self.cycle_start, cycle_len)
+
+        lead_in = self._counts(range(0, self.cycle_start))
+        cycle = self._counts(range(self.cycle_start, len(self.states)))
+        tail = self._counts(range(self.cycle_start, self.cycle_start + partial))
+
+        counts = [
+            before + full_cycles * during + after
+            for before, during, after in zip(lead_in, cycle, tail)
+        ]
+
+        return self.states[self.cycle_start + partial], counts
 
 
 @dataclass
@@ -161,6 +363,102 @@ class Circus:
 
         self.rounds += 1
 
+    def do_rounds_batch(self, rounds: int):
+        """
+        Like calling `do_round` the given number of times,
+        but each turn inspects all of a monkey's items at once as a numpy array.
+
+        Requires `bound_worries`, so that worries fit in an int64 even after squaring.
+        """
+        import numpy as np
+
+        modulus = self.monkeys[0].worry_modulus
+        if modulus is None:
+            raise ValueError("can only batch rounds with bounded worries")
+        if any(monke.operation(modulus - 1) >= 2**63 for monke in self.monkeys):
+            raise OverflowError(f"{modulus=} is too large for int64 worries")
+
+        # a monkey's hand is whatever it was holding plus everything thrown to it, in order
+        incoming: list[list[np.ndarray]] = [
+            [np.fromiter(monke.items, dtype=np.int64, count=len(monke.items))]
+            for monke in self.monkeys
+        ]
+
+        def hand(monke: Monke) -> np.ndarray:
+            pieces = incoming[monke.id]
+            incoming[monke.id] = []
+            match pieces:
+                case []:
+                    return np.empty(0, dtype=np.int64)
+                case [items]:
+                    return items
+                case _:
+                    return np.concatenate(pieces)
+
+        for _ in range(0, rounds):
+            for monke in self.monkeys:
+                items = hand(monke)
+                monke.inspection_count += len(items)
+
+                passed, failed = monke.inspect_batch(items)
+                incoming[monke.targets.true].append(passed)
+                incoming[monke.targets.false].append(failed)
+
+            self.rounds += 1
+
+        for monke in self.monkeys:
+            monke.items = deque(hand(monke).tolist())
+
+    def bound_worries(self):
+        """
+        Keep every worry level modulo the LCM of all the monkeys' test divisors.
+        That preserves every test result, so throws and inspection counts are unchanged,
+        but the numbers stop growing without bound.
+
+        Only valid when worries aren't divided down, by worry_divisor or an operation,
+        since `//` doesn't commute with `%`.
+        """
+        if any(monke.worry_divisor != 1 for monke in self.monkeys):
+            raise ValueError("can only bound worries when worry_divisor is 1")
+        if any(monke.op.kind is OpKind.FLOOR_DIVIDE for monke in self.monkeys):
+            raise ValueError("can't bound worries when an operation divides")
+
+        modulus = math.lcm(*(monke.divisor for monke in self.monkeys))
+        for monke in self.monkeys:
+            monke.bound_to(modulus)
+            monke.items = deque(item % modulus for item in monke.items)
+
+    def fast_forward(self, rounds: int):
+        """
+        Advance by the given number of rounds without simulating every one.
+
+        Items never interact, so each one is followed on its own until its
+        (monkey, worry) state repeats, and the rest is worked out arithmetically.
+        Inspection counts and which monkey holds which item match `do_round`,
+        but the order of items within a monkey's hand does not.
+
+        Requires `bound_worries`, otherwise the states might never repeat.
+        """
+        if any(monke.worry_modulus is None for monke in self.monkeys):
+            raise ValueError("can only fast forward with bounded worries")
+
+        held: Counter[ItemState] = Counter(
+            ItemState(monke.id, item) for monke in self.monkeys for item in monke.items
+        )
+
+        for monke in self.monkeys:
+            monke.items.clear()
+
+        for state, copies in held.items():
+            trajectory = ItemTrajectory.follow(self.monkeys, state, rounds)
+            final, counts = trajectory.after(rounds)
+
+            self.monkeys[final.monke_id].items.extend([final.item] * copies)
+            for monke, count in zip(self.monkeys, counts):
+                monke.inspection_count += count * copies
+
+        self.rounds += rounds
+
     def status(self, out: TextIO = sys.stdout):
         print(
             f"After round {self.rounds}, the monkeys are holding items with these worry levels:",
@@ -328,6 +626,88 @@ Monkey 3: """
 
         assert score == 10605
 
+    PART2_COUNTS_AFTER = {0: 52166, 1: 47830, 2: 1938, 3: 52013}
+
+    def test_op_spec(self):
+        cases = {
+            "old * 19": (OpSpec(OpKind.MULTIPLY, 19), 19 * 7),
+            "old + 6": (OpSpec(OpKind.ADD, 6), 7 + 6),
+            "old * old": (OpSpec(OpKind.SQUARE), 7 * 7),
+            "old / 2": (OpSpec(OpKind.FLOOR_DIVIDE, 2), 7 // 2),
+        }
+        for op_spec, (expected, result) in cases.items():
+            parsed = OpSpec.parse(op_spec)
+            assert parsed == expected
+            assert str(parsed) == op_spec
+            assert parsed.compile()(7) == result
+
+            for worry_divisor, modulus in ((1, None), (3, None), (1, 5), (3, 5)):
+                inspection = parsed.compile_inspection(2, worry_divisor, modulus)
+                item = result // worry_divisor
+                if modulus is not None:
+                    item %= modulus
+                assert inspection(7) == (item, item % 2 == 0)
+
+    def test_bounded_worries(self):
+        circus = Circus.parse(1, self.DATA.splitlines())
+        circus.bound_worries()
+
+        while circus.rounds != 10_000:
+            circus.do_round()
+
+        actual_count = {monkey.id: monkey.inspection_count for monkey in circus.monkeys}
+        assert actual_count == self.PART2_COUNTS_AFTER
+
+        assert score(*top_monkeys(circus)[:2]) == 2713310158
+
+    def test_fast_forward(self):
+        simulated = Circus.parse(1, self.DATA.splitlines())
+        simulated.bound_worries()
+        forwarded = Circus.parse(1, self.DATA.splitlines())
+        forwarded.bound_worries()
+
+        for rounds in (1, 7, 20, 1_000):
+            while simulated.rounds != rounds:
+                simulated.do_round()
+            forwarded.fast_forward(rounds - forwarded.rounds)
+
+            for expected, actual in zip(simulated.monkeys, forwarded.monkeys):
+                assert expected.inspection_count == actual.inspection_count
+                assert sorted(expected.items) == sorted(actual.items)
+
+        forwarded.fast_forward(10_000 - forwarded.rounds)
+        actual_count = {
+            monkey.id: monkey.inspection_count for monkey in forwarded.monkeys
+        }
+        assert actual_count == self.PART2_COUNTS_AFTER
+
+    def test_batch_rounds(self):
+        simulated = Circus.parse(1, self.DATA.splitlines())
+        simulated.bound_worries()
+        batched = Circus.parse(1, self.DATA.splitlines())
+        batched.bound_worries()
+
+        for rounds in (1, 20, 1_000):
+            while simulated.rounds != rounds:
+                simulated.do_round()
+            batched.do_rounds_batch(rounds - batched.rounds)
+
+            for expected, actual in zip(simulated.monkeys, batched.monkeys):
+                assert expected.inspection_count == actual.inspection_count
+                assert expected.items == actual.items
+
+    def test_run_jobs(self):
+        jobs = [
+            CircusJob(self.DATA, 3, 20),
+            CircusJob(self.DATA, 1, 10_000),
+            CircusJob(self.DATA, 1, 20),
+        ]
+        results = {result.job: result for result in run_jobs(jobs, max_workers=2)}
+
+        assert results[jobs[0]].score == 10605
+        assert results[jobs[1]].score == 2713310158
+        assert results[jobs[2]].inspection_counts == [99, 97, 8, 103]
+
 
 def top_monkeys(circus: Circus) -> list[Monke]:
     return sorted(circus.monkeys, reverse=True, key=lambda m: m.inspection_count)
@@ -337,6 +717,49 @@ def score(monke1: Monke, monke2: Monke) -> int:
     return monke1.inspection_count * monke2.inspection_count
 
 
+class CircusJob(NamedTuple):
+    spec: str
+    "the full text of the monkeys' notes"
+    worry_divisor: int
+    rounds: int
+
+
+class CircusResult(NamedTuple):
+    job: CircusJob
+    score: int
+    inspection_counts: list[int]
+    "by monkey id"
+
+
+def run_job(job: CircusJob) -> CircusResult:
+    circus = Circus.parse(job.worry_divisor, job.spec.splitlines())
+
+    if job.worry_divisor == 1:
+        circus.bound_worries()
+        circus.fast_forward(job.rounds)
+    else:
+        while circus.rounds != job.rounds:
+            circus.do_round()
+
+    return CircusResult(
+        job,
+        score(*top_monkeys(circus)[:2]),
+        [monke.inspection_count for monke in circus.monkeys],
+    )
+
+
+def run_jobs(
+    jobs: Iterable[CircusJob], max_workers: int | None = None
+) -> Iterator[CircusResult]:
+    """
+    Run each job in a process pool, yielding results as they finish (not in job order).
+    """
+    with ProcessPoolExecutor(max_workers) as pool:
+        futures = [pool.submit(run_job, job) for job in jobs]
+        for future in as_completed(futures):
+            yield future.result()
+
+
 def part1():
     circus = Circus.parse(3, input())
 
@@ -346,12 +769,56 @@ def part1():
 
     print(score_)
 
+
 def part2():
     circus = Circus.parse(1, input())
+    circus.bound_worries()
+    circus.fast_forward(10_000)
 
-    # is this going to break?
-    while circus.rounds != 10_000:
-        circus.do_round()
     score_ = score(*top_monkeys(circus)[:2])
 
-    print(score_)
\ No newline at end of file
+    print(score_)
+
+
+def bench_rounds(rounds: int = 10_000, chunk: int = 1_000, bounded: bool = True):
+    """
+    Time part2-style rounds in chunks, to check time per round stays flat.
+    """
+    circus = Circus.parse(1, input(11))
+    if bounded:
+        circus.bound_worries()
+
+    while circus.rounds < rounds:
+        count = min(chunk, rounds - circus.rounds)
+        start = time.perf_counter()
+        for _ in range(0, count):
+            circus.do_round()
+        elapsed = time.perf_counter() - start
+        print(f"rounds up to {circus.rounds}: {elapsed / count * 1e6:.1f}us/round")
+
+
+def bench_batch(items_per_monke: int = 10_000, rounds: int = 20):
+    """
+    Compare `do_round` against `do_rounds_batch` with lots of items per monkey.
+    """
+
+    def crowded() -> Circus:
+        circus = Circus.parse(1, input(11))
+        circus.bound_worries()
+        for monke in circus.monkeys:
+            monke.items = deque(i % monke.worry_modulus for i in range(items_per_monke))
+        return circus
+
+    simulated = crowded()
+    start = time.perf_counter()
+    for _ in range(0, rounds):
+        simulated.do_round()
+    one_at_a_time = time.perf_counter() - start
+
+    batched = crowded()
+    start = time.perf_counter()
+    batched.do_rounds_batch(rounds)
+    batch = time.perf_counter() - start
+
+    print(f"one at a time: {one_at_a_time:.3f}s, batch: {batch:.3f}s")
+    print(f"speedup: {one_at_a_time / batch:.1f}x")
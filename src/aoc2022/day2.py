@@ -2,7 +2,8 @@ from __future__ import annotations
 import enum
 import functools
 import sys
-from typing import Iterable, NamedTuple
+from collections import Counter
+from typing import Iterable, Mapping, NamedTuple, TypeAlias
 
 
 @functools.total_ordering
@@ -97,7 +98,7 @@ def day1_choices() -> Iterable[ChoiceDrivenMatch]:
 
 
 def day1():
-    print(sum(match.play() for match in day1_choices()))
+    print(score_file(sys.argv[1], CHOICE_DRIVEN_SCORES))
 
 
 class OutcomeBasedMatch(NamedTuple):
@@ -124,7 +125,112 @@ def day2_info() -> Iterable[OutcomeBasedMatch]:
 
 
 def day2():
-    print(sum(match.play() for match in day2_info()))
+    print(score_file(sys.argv[1], OUTCOME_BASED_SCORES))
+
+
+ScoreTable: TypeAlias = dict[tuple[str, str], int]
+
+CHOICE_DRIVEN_SCORES: ScoreTable = {
+    (theirs, ours): ChoiceDrivenMatch(
+        STRATEGY_MAPPING[theirs], STRATEGY_MAPPING[ours]
+    ).play()
+    for theirs in "ABC"
+    for ours in "XYZ"
+}
+"Score for every raw (theirs, ours) pair in the strategy guide, for day1"
+
+OUTCOME_BASED_SCORES: ScoreTable = {
+    (theirs, outcome): OutcomeBasedMatch(
+        STRATEGY_MAPPING[theirs], OUTCOME_MAPPING[outcome]
+    ).play()
+    for theirs in "ABC"
+    for outcome in "XYZ"
+}
+"Score for every raw (theirs, outcome) pair in the strategy guide, for day2"
+
+
+def score_counts(counts: Mapping[tuple[str, str], int], table: ScoreTable) -> int:
+    return sum(count * table[pair] for pair, count in counts.items())
+
+
+RECORDS: dict[tuple[str, str], bytes] = {
+    (theirs, ours): f"{theirs} {ours}".encode() for theirs in "ABC" for ours in "XYZ"
+}
+"The raw bytes of each of the 9 possible lines"
+
+
+def _fixed_width_histogram(buf: bytes | memoryview) -> dict[tuple[str, str], int]:
+    """
+    Count records with numpy, assuming every line is exactly "X Y\n".
+    Raises ValueError if the buffer isn't laid out like that.
+    """
+    import numpy as np
+
+    data = np.frombuffer(buf, dtype=np.uint8)
+    whole = len(data) // 4 * 4
+
+    # each line is then a single 4 byte word, viewed without copying
+    words, counts = np.unique(data[:whole].view("<u4"), return_counts=True)
+    by_word = dict(zip(words.tolist(), counts.tolist()))
+
+    line_words = {
+        pair: int.from_bytes(record + b"\n", "little")
+        for pair, record in RECORDS.items()
+    }
+    if not by_word.keys() <= set(line_words.values()):
+        raise ValueError("strategy guide isn't fixed width")
+
+    histogram = {pair: by_word.get(word, 0) for pair, word in line_words.items()}
+
+    # the last line might not have a newline
+    if last := bytes(data[whole:]):
+        pair = next((pair for pair, record in RECORDS.items() if record == last), None)
+        if pair is None:
+            raise ValueError("strategy guide isn't fixed width")
+        histogram[pair] += 1
+
+    return histogram
+
+
+def record_histogram(buf: bytes | memoryview) -> dict[tuple[str, str], int]:
+    """
+    How many times each of the 9 possible records appears in the raw strategy guide.
+
+    Uses numpy if it's installed and every line is exactly "X Y\n".
+    Otherwise counts each record with bytes.count, which can't miscount
+    since a record can't straddle a line break.
+    """
+    try:
+        return _fixed_width_histogram(buf)
+    except (ImportError, ValueError):
+        pass
+
+    data = bytes(buf)
+    return {pair: data.count(record) for pair, record in RECORDS.items()}
+
+
+def score_file(path: str, table: ScoreTable) -> int:
+    """
+    There are only 9 distinct lines, so count them up and score each kind once.
+    """
+    with open(path, "rb") as f:
+        return score_counts(record_histogram(f.read()), table)
+
+
+TEST_INPUT = """A Y
+B X
+C Z"""
+
+
+def test():
+    pairs = Counter(tuple(line.split()) for line in TEST_INPUT.splitlines())
+    assert score_counts(pairs, CHOICE_DRIVEN_SCORES) == 15
+    assert score_counts(pairs, OUTCOME_BASED_SCORES) == 12
+
+    for guide in (TEST_INPUT, TEST_INPUT + "\n", TEST_INPUT.replace("\n", "\r\n")):
+        assert record_histogram(guide.encode()) == {
+            pair: pairs[pair] for pair in RECORDS
+        }
 
 
 if __name__ == "__main__":
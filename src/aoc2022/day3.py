@@ -1,4 +1,12 @@
-from typing import Iterable
+from __future__ import annotations
+
+import string
+from typing import TYPE_CHECKING, Iterable
+
+from .common import input, input_buffer
+
+if TYPE_CHECKING:
+    import numpy as np
 
 
 def appears_in_both(line: str) -> str:
@@ -16,8 +24,22 @@ def priority(item: str) -> int:
         raise Exception("unreachable")
 
 
+PRIORITIES: dict[str | int, int] = {
+    key: priority(item) for item in string.ascii_letters for key in (item, ord(item))
+}
+"Priority of each item, as a character or a byte"
+
+ITEM_BITS: dict[str | int, int] = {
+    item: 1 << (priority - 1) for item, priority in PRIORITIES.items()
+}
+"""
+Each item mapped to a mask with just the bit for its priority, for the bulk scorers.
+Per line in python, sets are faster, since building one is all in C.
+"""
+
+
 def priority_sum(f: Iterable[str], /) -> int:
-    return sum((priority(appears_in_both(line)) for line in f))
+    return sum(PRIORITIES[appears_in_both(line)] for line in f)
 
 
 TEST_INPUT_PART1 = """vJrwpWtwJgWrhcsFMMfFFhFp
@@ -31,12 +53,14 @@ TEST_ANSWER_PART1 = 157
 
 
 def test() -> int:
-    return priority_sum(TEST_INPUT_PART1.splitlines())
+    lines = TEST_INPUT_PART1.splitlines()
+    assert priority_sum(lines) == TEST_ANSWER_PART1
+    assert bulk_priority_sum(TEST_INPUT_PART1.encode()) == TEST_ANSWER_PART1
+    return priority_sum(lines)
 
 
 def part1():
-    with open("inputs/day3.txt") as f:
-        print(sum((priority(appears_in_both(line)) for line in f)))
+    print(priority_sum(input()))
 
 
 def elf_groups(f: Iterable[str], /) -> Iterable[tuple[str, str, str]]:
@@ -65,6 +89,89 @@ CrZsJsPPZsGzwwsLwLmpwMDw"""
 PART2_TEST_ANSWER = 70
 
 
+def group_priority_sum(f: Iterable[str], /) -> int:
+    return sum(PRIORITIES[common_item(*group)] for group in elf_groups(f))
+
+
+def test_part2():
+    lines = (PART2_TEST_INPUT_GROUP_1 + "\n" + PART2_TEST_INPUT_GROUP_2).splitlines()
+    assert group_priority_sum(lines) == PART2_TEST_ANSWER
+    assert bulk_group_priority_sum("\n".join(lines).encode()) == PART2_TEST_ANSWER
+
+
 def part2():
-    with open("inputs/day3.txt") as f:
-        print(sum(priority(common_item(*group)) for group in elf_groups(f)))
+    print(group_priority_sum(input()))
+
+
+def _bulk_lines(buf: bytes | memoryview) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    The item bit for every byte of a whole file, plus where each non-empty line starts and ends.
+    Lines must end with \n, apart from maybe the last.
+    """
+    import numpy as np
+
+    data = np.frombuffer(buf, dtype=np.uint8)
+    if len(data) and data[-1] != ord("\n"):
+        data = np.append(data, np.uint8(ord("\n")))
+
+    bits_table = np.zeros(256, dtype=np.uint64)
+    for item, bit in ITEM_BITS.items():
+        if isinstance(item, int):
+            bits_table[item] = bit
+
+    ends = np.flatnonzero(data == ord("\n"))
+    starts = np.concatenate(([0], ends[:-1] + 1))
+
+    non_empty = ends > starts
+    return bits_table[data], starts[non_empty], ends[non_empty]
+
+
+def _masks_priorities(masks: np.ndarray) -> np.ndarray:
+    import numpy as np
+
+    # frexp's exponent is bit_length(),
+    # exact since every bit we use is well within a float64's mantissa
+    _mantissas, exponents = np.frexp(masks.astype(np.float64))
+    return exponents
+
+
+def bulk_priority_sum(buf: bytes | memoryview) -> int:
+    """
+    `priority_sum` over a whole file's bytes at once, with no python loop per line.
+    """
+    import numpy as np
+
+    bits, starts, ends = _bulk_lines(buf)
+    middles = starts + (ends - starts) // 2
+
+    # or together each run of bits between consecutive boundaries.
+    # the back half's run includes the newline, which has no bits.
+    boundaries = np.column_stack((starts, middles)).ravel()
+    halves = np.bitwise_or.reduceat(bits, boundaries)
+    shared = np.bitwise_and(halves[0::2], halves[1::2])
+
+    return int(_masks_priorities(shared).sum())
+
+
+def bulk_group_priority_sum(buf: bytes | memoryview) -> int:
+    """
+    `group_priority_sum` over a whole file's bytes at once, with no python loop per line.
+    """
+    import numpy as np
+
+    bits, starts, _ends = _bulk_lines(buf)
+    line_masks = np.bitwise_or.reduceat(bits, starts)
+
+    # like elf_groups, ignore an incomplete group at the end
+    groups = line_masks[: len(line_masks) // 3 * 3].reshape(-1, 3)
+    shared = np.bitwise_and.reduce(groups, axis=1)
+
+    return int(_masks_priorities(shared).sum())
+
+
+def part1_bulk():
+    print(bulk_priority_sum(input_buffer()))
+
+
+def part2_bulk():
+    print(bulk_group_priority_sum(input_buffer()))
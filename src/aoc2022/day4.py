@@ -1,5 +1,17 @@
 from __future__ import annotations
-from typing import Iterable, NamedTuple
+import bisect
+import heapq
+import itertools
+import random
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, NamedTuple
+
+from .common import input, input_buffer
+
+if TYPE_CHECKING:
+    import numpy as np
 
 
 class Assignment:
@@ -7,12 +19,12 @@ class Assignment:
     lower: int
     upper: int
 
+    __slots__ = ("lower", "upper")
+
     def __init__(self, lower: int, upper: int):
         if lower > upper:
             raise ValueError(f"{lower=} must be lower than {upper=}")
 
-        super().__init__()
-
         self.lower = lower
         self.upper = upper
 
@@ -85,6 +97,309 @@ def touch_at_all(
             yield left, right
 
 
+def overlapping_pairs(
+    assignments: Iterable[Assignment],
+) -> Iterable[tuple[Assignment, Assignment]]:
+    """
+    Every pair of assignments anywhere in the input that overlap,
+    by sweeping across them in order of their lower bound.
+    O(n log n + k) for k pairs, unlike checking every combination.
+    """
+    ordered = sorted(assignments, key=lambda a: a.lower)
+
+    # heap of those that could still overlap, by upper bound
+    active: list[tuple[int, int, Assignment]] = []
+    for i, assignment in enumerate(ordered):
+        while active and active[0][0] < assignment.lower:
+            heapq.heappop(active)
+
+        for _upper, _i, other in active:
+            yield other, assignment
+
+        heapq.heappush(active, (assignment.upper, i, assignment))
+
+
+@dataclass
+class _IntervalNode:
+    center: int
+
+    by_lower: list[Assignment]
+    "those that include center, by ascending lower bound"
+
+    by_upper: list[Assignment]
+    "those that include center, by descending upper bound"
+
+    left: _IntervalNode | None
+    "those entirely below center"
+
+    right: _IntervalNode | None
+    "those entirely above center"
+
+    @classmethod
+    def build(cls, by_lower: list[Assignment]) -> _IntervalNode | None:
+        if not by_lower:
+            return None
+
+        center = by_lower[len(by_lower) // 2].lower
+
+        left = [a for a in by_lower if a.upper < center]
+        right = [a for a in by_lower if a.lower > center]
+        here = [a for a in by_lower if a.lower <= center <= a.upper]
+
+        return cls(
+            center,
+            here,
+            sorted(here, key=lambda a: a.upper, reverse=True),
+            cls.build(left),
+            cls.build(right),
+        )
+
+
+class _SparseTable:
+    """
+    The index of the largest value in any slice in O(1), after O(n log n) setup,
+    from the index of the largest in every run whose length is a power of two.
+    """
+
+    def __init__(self, values: list[int]):
+        self.values = values
+
+        level = list(range(0, len(values)))
+        self.levels = [level]
+        width = 1
+        while 2 * width <= len(values):
+            level = [
+                a if values[a] >= values[b] else b for a, b in zip(level, level[width:])
+            ]
+            self.levels.append(level)
+            width *= 2
+
+    def argmax(self, start: int, end: int) -> int:
+        "Where the largest in values[start:end] is, which mustn't be empty."
+        # two runs that cover the slice between them, overlapping in the middle
+        level = (end - start).bit_length() - 1
+        a = self.levels[level][start]
+        b = self.levels[level][end - (1 << level)]
+        return a if self.values[a] >= self.values[b] else b
+
+    def at_least(self, start: int, end: int, threshold: int) -> Iterator[int]:
+        """
+        Indices in start:end whose value is at least the threshold. O(k + 1)
+
+        The largest either misses, so none of the slice can match,
+        or it matches and splits the slice in two to search the same way.
+        """
+        to_visit = [(start, end)]
+        while to_visit:
+            start, end = to_visit.pop()
+            if start >= end:
+                continue
+
+            best = self.argmax(start, end)
+            if self.values[best] < threshold:
+                continue
+
+            yield best
+            to_visit.append((best + 1, end))
+            to_visit.append((start, best))
+
+
+class AssignmentIndex:
+    """
+    An interval tree over every assignment in the input, for queries across all of them.
+    Queries include the assignment itself if it's in the index.
+    """
+
+    def __init__(self, assignments: Iterable[Assignment]):
+        self.by_lower = sorted(assignments, key=lambda a: (a.lower, a.upper))
+        self.lowers = [a.lower for a in self.by_lower]
+        self.uppers = sorted(a.upper for a in self.by_lower)
+        self.root = _IntervalNode.build(self.by_lower)
+
+        # upper bounds in by_lower order, negated for the smallest
+        self._highest_upper = _SparseTable([a.upper for a in self.by_lower])
+        self._lowest_upper = _SparseTable([-a.upper for a in self.by_lower])
+
+    def __len__(self):
+        return len(self.by_lower)
+
+    def stabbing(self, point: int) -> Iterable[Assignment]:
+        "Everything that includes the point. O(log n + k)"
+        node = self.root
+        while node is not None:
+            if point < node.center:
+                yield from itertools.takewhile(
+                    lambda a: a.lower <= point, node.by_lower
+                )
+                node = node.left
+            elif point > node.center:
+                yield from itertools.takewhile(
+                    lambda a: a.upper >= point, node.by_upper
+                )
+                node = node.right
+            else:
+                yield from node.by_lower
+                return
+
+    def overlapping(self, other: Assignment) -> Iterable[Assignment]:
+        "Everything that overlaps the assignment. O(log n + k)"
+        # either it includes other's lower bound, or it starts partway through other
+        yield from self.stabbing(other.lower)
+
+        start = bisect.bisect_right(self.lowers, other.lower)
+        end = bisect.bisect_right(self.lowers, other.upper)
+        yield from self.by_lower[start:end]
+
+    def containing(self, other: Assignment) -> Iterable[Assignment]:
+        """
+        Everything the assignment is in. O(log n + k)
+        Of those starting at or before it, the ones ending at or after it.
+        """
+        end = bisect.bisect_right(self.lowers, other.lower)
+        for i in self._highest_upper.at_least(0, end, other.upper):
+            yield self.by_lower[i]
+
+    def contained_in(self, other: Assignment) -> Iterable[Assignment]:
+        """
+        Everything in the assignment. O(log n + k)
+        Of those starting within it, the ones ending at or before it.
+        """
+        start = bisect.bisect_left(self.lowers, other.lower)
+        end = bisect.bisect_right(self.lowers, other.upper)
+        for i in self._lowest_upper.at_least(start, end, -other.upper):
+            yield self.by_lower[i]
+
+    def overlap_count(self, other: Assignment) -> int:
+        "How many overlap the assignment. O(log n)"
+        # the ones that don't either start after it or end before it, never both
+        start_after = len(self) - bisect.bisect_right(self.lowers, other.upper)
+        end_before = bisect.bisect_left(self.uppers, other.lower)
+        return len(self) - start_after - end_before
+
+
+def bench_all_pairs(count: int = 3_000, span: int = 10_000):
+    "Compare the sweep and index against checking every combination."
+    random.seed(count)
+    everything = []
+    for _ in range(0, count):
+        lower = random.randrange(0, span)
+        everything.append(Assignment(lower, lower + random.randrange(0, span // 100)))
+
+    start = time.perf_counter()
+    naive = sum(
+        1
+        for left, right in itertools.combinations(everything, 2)
+        if left.overlaps_with(right) or right.overlaps_with(left)
+    )
+    naive_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    swept = sum(1 for _pair in overlapping_pairs(everything))
+    sweep_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = AssignmentIndex(everything)
+    # every overlap is counted from both sides, plus each one overlaps itself
+    indexed = (sum(index.overlap_count(a) for a in everything) - count) // 2
+    index_time = time.perf_counter() - start
+
+    assert naive == swept == indexed
+    print(f"{naive} overlapping pairs among {count} assignments")
+    print(
+        f"pairwise: {naive_time:.3f}s, sweep: {sweep_time:.3f}s, index: {index_time:.3f}s"
+    )
+
+
+class _DictAssignment:
+    "Assignment as it was before __slots__, to compare against."
+
+    def __init__(self, lower: int, upper: int):
+        if lower > upper:
+            raise ValueError(f"{lower=} must be lower than {upper=}")
+
+        super().__init__()
+
+        self.lower = lower
+        self.upper = upper
+
+
+def bench_assignment(count: int = 10_000_000):
+    "Memory and construction time for `count` lines' worth of assignments."
+    bounds = [
+        (int(lower), int(upper))
+        for line in PART1_TEST_INPUT.splitlines()
+        for assignment in line.split(",")
+        for lower, upper in (assignment.split("-"),)
+    ]
+
+    constructors: dict[str, Callable[[int, int], object]] = {
+        "plain class": _DictAssignment,
+        "slots": Assignment,
+    }
+
+    def build(constructor: Callable[[int, int], object]) -> list[object]:
+        repeated = itertools.islice(itertools.cycle(bounds), 2 * count)
+        return [constructor(lower, upper) for lower, upper in repeated]
+
+    for name, constructor in constructors.items():
+        start = time.perf_counter()
+        build(constructor)
+        elapsed = time.perf_counter() - start
+
+        # separately, since tracing slows everything down
+        tracemalloc.start()
+        built = build(constructor)
+        used, _peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        per = used / len(built)
+        print(f"{name}: {elapsed:.2f}s, {used / 2**20:.0f}MiB ({per:.0f} bytes each)")
+        del built
+
+
+def test_assignment():
+    assert not hasattr(Assignment(2, 4), "__dict__")
+
+    try:
+        Assignment.from_str("4-2")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("backwards bounds should be rejected")
+
+
+def test_index():
+    random.seed(4)
+    examples = [
+        [a for pair in assignment_pairs(PART1_TEST_INPUT.splitlines()) for a in pair],
+        [
+            Assignment(lower, lower + random.randrange(0, 20))
+            for lower in (random.randrange(0, 100) for _ in range(0, 300))
+        ],
+    ]
+
+    def same(found: Iterable[Assignment], expected: Iterable[Assignment]) -> bool:
+        return sorted(map(id, found)) == sorted(map(id, expected))
+
+    for everything in examples:
+        index = AssignmentIndex(everything)
+        highest = max(a.upper for a in everything)
+
+        for point in range(-1, highest + 2):
+            expected = [a for a in everything if a.lower <= point <= a.upper]
+            assert same(index.stabbing(point), expected)
+
+        queries = everything + [Assignment(-5, -1), Assignment(0, highest + 1)]
+        for q in queries:
+            touching = [
+                a for a in everything if a.lower <= q.upper and q.lower <= a.upper
+            ]
+            assert same(index.overlapping(q), touching)
+            assert index.overlap_count(q) == len(touching)
+            assert same(index.containing(q), [a for a in everything if q in a])
+            assert same(index.contained_in(q), [a for a in everything if a in q])
+
+
 def test_part1():
     print(
         sum(
@@ -103,11 +418,70 @@ def test_part2():
 
 
 def part1():
-    with open("inputs/day4.txt") as f:
-        print(sum(1 for _x in all_fully_contained(assignment_pairs(f))))
+    print(sum(1 for _x in all_fully_contained(assignment_pairs(input()))))
+
 
 def part2():
-    with open("inputs/day4.txt") as f:
-        print(sum(1 for _x in touch_at_all(assignment_pairs(f))))
+    print(sum(1 for _x in touch_at_all(assignment_pairs(input()))))
+
+
+class AssignmentColumns(NamedTuple):
+    "Every pair in the input, as one array per bound."
+
+    lower1: np.ndarray
+    upper1: np.ndarray
+    lower2: np.ndarray
+    upper2: np.ndarray
+
+    @classmethod
+    def parse(cls, buf: bytes | memoryview) -> AssignmentColumns:
+        """
+        Parse a whole file of "l1-u1,l2-u2" lines in one pass,
+        by turning the separators into spaces and letting numpy read the numbers.
+        """
+        import numpy as np
+
+        text = bytes(buf).translate(_SEPARATORS_TO_SPACES).decode("ascii")
+        numbers = np.fromstring(text, dtype=np.int32, sep=" ")
+        if len(numbers) % 4:
+            raise ValueError("every line needs two assignments")
+
+        columns = cls(*numbers.reshape(-1, 4).T)
+        if (columns.lower1 > columns.upper1).any() or (
+            columns.lower2 > columns.upper2
+        ).any():
+            raise ValueError("lower bounds must not be above upper bounds")
+
+        return columns
+
+    def fully_contained(self) -> np.ndarray:
+        "Whether either of each pair is in the other, like `all_fully_contained`."
+        left_in_right = (self.lower2 <= self.lower1) & (self.upper1 <= self.upper2)
+        right_in_left = (self.lower1 <= self.lower2) & (self.upper2 <= self.upper1)
+        return left_in_right | right_in_left
+
+    def touching(self) -> np.ndarray:
+        "Whether each pair overlaps at all, like `touch_at_all`."
+        return (self.lower1 <= self.upper2) & (self.lower2 <= self.upper1)
+
+
+_SEPARATORS_TO_SPACES = bytes.maketrans(b"-,\r\n", b"    ")
+
+
+def part1_columnar():
+    print(int(AssignmentColumns.parse(input_buffer()).fully_contained().sum()))
+
+
+def part2_columnar():
+    print(int(AssignmentColumns.parse(input_buffer()).touching().sum()))
+
+
+def test_columnar():
+    columns = AssignmentColumns.parse(PART1_TEST_INPUT.encode())
+    pairs = list(assignment_pairs(PART1_TEST_INPUT.splitlines()))
+
+    assert columns.fully_contained().sum() == len(list(all_fully_contained(pairs)))
+    assert columns.touching().sum() == len(list(touch_at_all(pairs)))
+
 
 # all_fully_contained(PART1_TEST_INPUT.splitlines())
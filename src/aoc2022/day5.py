@@ -1,8 +1,12 @@
 from __future__ import annotations
 import enum
 import re
-from typing import Iterable, NamedTuple, NewType, TypeAlias
-from dataclasses import dataclass
+import random
+import time
+from typing import Iterable, Iterator, NamedTuple, NewType, Sequence, TypeAlias
+from dataclasses import dataclass, field
+
+from .common import input
 
 
 class Instruction(NamedTuple):
@@ -26,6 +30,18 @@ class Instruction(NamedTuple):
         else:
             return cls.from_match(match)
 
+    @classmethod
+    def from_fields(cls, line: str):
+        """
+        Like from_line, but relies on the fixed "move N from S to T" format
+        and just splits on whitespace instead of searching with a regex.
+        """
+        try:
+            _move, count, _from, source, _to, target = line.split()
+            return cls(int(count), int(source), int(target))
+        except ValueError:
+            raise ValueError(f"line didn't match pattern: {line}") from None
+
 
 class LineType(NamedTuple):
     """
@@ -152,10 +168,315 @@ class Warehouse:
     def tops(self) -> str:
         msg = ""
         for column in self.crates:
-            msg += column[len(column)-1]
+            if column:
+                msg += column[len(column)-1]
         
         return msg
 
+    def snapshot(self) -> bytes:
+        """
+        A compact copy of the current layout, one line of crates per column, bottom first.
+        Safe to keep around or write out, since later moves don't touch it.
+        """
+        return "\n".join("".join(column) for column in self.crates).encode()
+
+    @classmethod
+    def from_snapshot(cls, snapshot: bytes):
+        columns = snapshot.decode().split("\n")
+        return cls([[Crate(crate) for crate in column] for column in columns])
+
+
+@dataclass
+class CheckpointedRun:
+    """
+    A run of instructions over a warehouse that snapshots the layout every `interval`
+    instructions as it advances, so the state after any instruction can be looked up
+    again by replaying from the nearest checkpoint instead of from the start.
+
+    If the snapshots go over `memory_budget` bytes, the interval is doubled
+    and every other checkpoint is dropped.
+    """
+
+    start: Warehouse
+    instructions: Sequence[Instruction]
+    keep_order: bool = False
+    "The 9001 if true, otherwise the 9000"
+    interval: int = 1_000
+    memory_budget: int | None = None
+    checkpoints: dict[int, bytes] = field(init=False)
+    "Snapshots by how many instructions had been run"
+
+    current: Warehouse = field(init=False)
+    "The warehouse as the run has left it, `done` instructions in"
+    done: int = field(init=False, default=0)
+
+    def __post_init__(self):
+        self.checkpoints = {0: self.start.snapshot()}
+        self.current = Warehouse.from_snapshot(self.checkpoints[0])
+
+    @property
+    def checkpoint_bytes(self) -> int:
+        return sum(len(snapshot) for snapshot in self.checkpoints.values())
+
+    def _record(self, done: int, warehouse: Warehouse):
+        if done % self.interval or done in self.checkpoints:
+            return
+
+        self.checkpoints[done] = warehouse.snapshot()
+
+        # always keep the starting layout, or there'd be nothing to replay from
+        while (
+            self.memory_budget is not None
+            and self.checkpoint_bytes > self.memory_budget
+            and len(self.checkpoints) > 1
+        ):
+            self.interval *= 2
+            self.checkpoints = {
+                at: snapshot
+                for at, snapshot in self.checkpoints.items()
+                if at % self.interval == 0
+            }
+
+    def advance(self, count: int | None = None) -> Warehouse:
+        "Run the next `count` instructions, or the rest, snapshotting along the way."
+        stop = len(self.instructions)
+        if count is not None:
+            stop = min(self.done + count, stop)
+
+        current = self.current
+        move = current.move_9001 if self.keep_order else current.move_9000
+        for at in range(self.done, stop):
+            move(self.instructions[at])
+            self._record(at + 1, current)
+
+        self.done = stop
+        return current
+
+    def warehouse_at(self, done: int) -> Warehouse:
+        """
+        A copy of the warehouse as it was after the first `done` instructions.
+        Anything past where the run has got to is advanced to first.
+        """
+        if not 0 <= done <= len(self.instructions):
+            raise IndexError(f"no such point in the run: {done}")
+
+        if done >= self.done:
+            self.advance(done - self.done)
+            return Warehouse.from_snapshot(self.current.snapshot())
+
+        nearest = max(at for at in self.checkpoints if at <= done)
+        warehouse = Warehouse.from_snapshot(self.checkpoints[nearest])
+        move = warehouse.move_9001 if self.keep_order else warehouse.move_9000
+        for instruction in self.instructions[nearest:done]:
+            move(instruction)
+
+        return warehouse
+
+    def tops_at(self, done: int) -> str:
+        return self.warehouse_at(done).tops()
+
+
+class _Rope:
+    """
+    A node in an implicit treap: a sequence of crates as a randomly balanced tree,
+    ordered by position rather than by key, so it can be split and joined anywhere.
+    """
+
+    __slots__ = ("left", "right", "priority", "size", "flipped", "crate")
+
+    def __init__(self, crate: Crate, priority: float):
+        self.left: _Rope | None = None
+        self.right: _Rope | None = None
+        self.priority = priority
+        self.size = 1
+        # whether this subtree's order is reversed, but not yet pushed down to its children
+        self.flipped = False
+        self.crate = crate
+
+    def push(self):
+        if self.flipped:
+            self.left, self.right = self.right, self.left
+            for child in (self.left, self.right):
+                if child is not None:
+                    child.flipped = not child.flipped
+            self.flipped = False
+
+    def update(self):
+        self.size = 1 + _rope_size(self.left) + _rope_size(self.right)
+
+
+def _rope_size(rope: _Rope | None) -> int:
+    return rope.size if rope is not None else 0
+
+
+def _rope_from(crates: Sequence[Crate]) -> _Rope | None:
+    "Build a rope in order in O(n), as a cartesian tree of random priorities."
+    spine: list[_Rope] = []
+    for crate in crates:
+        node = _Rope(crate, random.random())
+        last = None
+        while spine and spine[-1].priority < node.priority:
+            last = spine.pop()
+            last.update()
+        node.left = last
+        if spine:
+            spine[-1].right = node
+        spine.append(node)
+
+    for node in reversed(spine):
+        node.update()
+
+    return spine[0] if spine else None
+
+
+def _rope_split(rope: _Rope | None, count: int) -> tuple[_Rope | None, _Rope | None]:
+    "Split off the first `count` crates. O(log n)"
+    if rope is None:
+        return None, None
+
+    rope.push()
+    if _rope_size(rope.left) >= count:
+        first, rope.left = _rope_split(rope.left, count)
+        rope.update()
+        return first, rope
+    else:
+        rope.right, rest = _rope_split(rope.right, count - _rope_size(rope.left) - 1)
+        rope.update()
+        return rope, rest
+
+
+def _rope_join(first: _Rope | None, second: _Rope | None) -> _Rope | None:
+    "Concatenate two ropes. O(log n)"
+    if first is None:
+        return second
+    if second is None:
+        return first
+
+    if first.priority > second.priority:
+        first.push()
+        first.right = _rope_join(first.right, second)
+        first.update()
+        return first
+    else:
+        second.push()
+        second.left = _rope_join(first, second.left)
+        second.update()
+        return second
+
+
+def _rope_crates(rope: _Rope | None) -> list[Crate]:
+    crates: list[Crate] = []
+    to_visit: list[_Rope | Crate] = [rope] if rope is not None else []
+    while to_visit:
+        match to_visit.pop():
+            case _Rope() as node:
+                node.push()
+                for part in (node.right, node.crate, node.left):
+                    if part is not None:
+                        to_visit.append(part)
+            case crate:
+                crates.append(crate)
+    return crates
+
+
+def _rope_last(rope: _Rope) -> Crate:
+    while True:
+        rope.push()
+        if rope.right is None:
+            return rope.crate
+        rope = rope.right
+
+
+@dataclass
+class RopeWarehouse:
+    """
+    Like Warehouse, but each column is a rope,
+    so moving any number of crates at once is O(log n) instead of O(count).
+    """
+
+    columns: list[_Rope | None]
+    "bottom to top, like Warehouse.crates"
+
+    @classmethod
+    def from_crates(cls, crates: list[list[Crate]]):
+        return cls([_rope_from(column) for column in crates])
+
+    @property
+    def crates(self) -> list[list[Crate]]:
+        return [_rope_crates(column) for column in self.columns]
+
+    def run_9000(self, instructions: Iterable[Instruction]):
+        for instruction in instructions:
+            self.move_9000(instruction)
+
+    def run_9001(self, instructions: Iterable[Instruction]):
+        for instruction in instructions:
+            self.move_9001(instruction)
+
+    def _take(self, count: int, source: int) -> _Rope | None:
+        column = self.columns[source - 1]
+        rest, top = _rope_split(column, _rope_size(column) - count)
+        self.columns[source - 1] = rest
+        return top
+
+    def _put(self, crates: _Rope | None, target: int):
+        self.columns[target - 1] = _rope_join(self.columns[target - 1], crates)
+
+    def move_9001(self, instruction: Instruction):
+        count, source, target = instruction
+        self._put(self._take(count, source), target)
+
+    def move_9000(self, instruction: Instruction):
+        # moving one at a time is the same as moving them all at once, reversed
+        count, source, target = instruction
+        crates = self._take(count, source)
+        if crates is not None:
+            crates.flipped = not crates.flipped
+        self._put(crates, target)
+
+    def tops(self) -> str:
+        return "".join(_rope_last(column) for column in self.columns if column)
+
+
+def replay_tops(
+    crates: list[list[Crate]], instructions: Sequence[Instruction], keep_order: bool
+) -> str:
+    """
+    What `tops()` would be after running the instructions, without moving any crates.
+
+    Works out where each column's top ends up, then walks the instructions backwards
+    to find which original crate was moved there.
+    Costs instructions x columns, no matter how many crates get moved.
+    `keep_order` is the 9001, otherwise it's the 9000.
+    """
+    heights = [len(column) for column in crates]
+    for count, source, target in instructions:
+        heights[source - 1] -= count
+        heights[target - 1] += count
+
+    # (column, height) of each final top, 0-indexed
+    tracked = [(column, height - 1) for column, height in enumerate(heights) if height]
+
+    for count, source, target in reversed(instructions):
+        source -= 1
+        target -= 1
+
+        # undo the instruction, so heights are what they were before it
+        heights[source] += count
+        heights[target] -= count
+        left_behind = heights[source] - count
+
+        for i, (column, height) in enumerate(tracked):
+            if column != target or height < heights[target]:
+                continue
+
+            # it was one of the moved crates
+            moved_index = height - heights[target]
+            if not keep_order:
+                moved_index = count - 1 - moved_index
+            tracked[i] = (source, left_behind + moved_index)
+
+    return "".join(crates[column][height] for column, height in tracked)
 
 
 def parse(lines: Iterable[str]) -> tuple[Warehouse, list[Instruction]]:
@@ -191,6 +512,52 @@ def parse(lines: Iterable[str]) -> tuple[Warehouse, list[Instruction]]:
     return Warehouse(columnwise), instructions
 
 
+def parse_header(lines: Iterator[str]) -> Warehouse:
+    """
+    Parse just the crates, leaving `lines` at the instructions.
+    """
+    rowwise: RowWiseCrates = []
+    for line in lines:
+        match LineType.inspect(line):
+            case CrateLine():
+                rowwise.append(crates_for_line(line))
+            case ColumnNumbersLine():
+                break
+            case None:
+                continue
+            case _:
+                raise ValueError(f"expected crates, got: {line}")
+
+    if not rowwise:
+        raise ValueError("no crates read")
+
+    return Warehouse(crates_rowwise_to_columnwise(rowwise))
+
+
+def stream_instructions(lines: Iterable[str]) -> Iterator[Instruction]:
+    for line in lines:
+        if line:
+            yield Instruction.from_fields(line)
+
+
+def run_streaming(lines: Iterable[str], keep_order: bool) -> Warehouse:
+    """
+    Parse the crates, then apply each instruction as it's read
+    instead of collecting them all first.
+    `keep_order` is the 9001, otherwise it's the 9000.
+    """
+    line_iter = iter(lines)
+    warehouse = parse_header(line_iter)
+
+    instructions = stream_instructions(line_iter)
+    if keep_order:
+        warehouse.run_9001(instructions)
+    else:
+        warehouse.run_9000(instructions)
+
+    return warehouse
+
+
 TEST_INPUT = """    [D]    
 [N] [C]    
 [Z] [M] [P]
@@ -203,19 +570,133 @@ move 1 from 1 to 2
 """
 
 def part1():
-    with open("inputs/day5.txt") as f:
-        lines = (line.rstrip('\n') for line in f)
-        warehouse, instructions = parse(lines)
+    warehouse, instructions = parse(input(strip=False))
     
     warehouse.run_9000(instructions)
 
     print(warehouse.tops())
 
 def part2():
-    with open("inputs/day5.txt") as f:
-        lines = (line.rstrip('\n') for line in f)
-        warehouse, instructions = parse(lines)
+    warehouse, instructions = parse(input(strip=False))
     
     warehouse.run_9001(instructions)
 
-    print(warehouse.tops())
\ No newline at end of file
+    print(warehouse.tops())
+
+
+def part1_streaming():
+    print(run_streaming(input(strip=False), keep_order=False).tops())
+
+
+def part2_streaming():
+    print(run_streaming(input(strip=False), keep_order=True).tops())
+
+
+def synthetic_instructions(
+    columns: int, count: int, max_move: int, seed: int = 0
+) -> Iterable[Instruction]:
+    """
+    Random instructions that never take more crates from a column than it has,
+    given the column sizes they're meant for.
+    """
+    rng = random.Random(seed)
+    sizes = [max_move] * columns
+    for _ in range(0, count):
+        source = max(
+            range(0, columns), key=lambda column: (sizes[column], rng.random())
+        )
+        target = rng.choice(
+            [column for column in range(0, columns) if column != source]
+        )
+        moved = rng.randint(1, min(max_move, sizes[source]))
+        sizes[source] -= moved
+        sizes[target] += moved
+        yield Instruction(moved, source + 1, target + 1)
+
+
+def bench_bulk_moves(
+    columns: int = 9, instructions: int = 2_000, max_move: int = 100_000
+):
+    "Compare Warehouse and RopeWarehouse on moves of huge numbers of crates."
+    stacks = [
+        [Crate(chr(ord("A") + (column + i) % 26)) for i in range(0, max_move)]
+        for column in range(0, columns)
+    ]
+    steps = list(synthetic_instructions(columns, instructions, max_move))
+
+    for name, run in (("9000", "run_9000"), ("9001", "run_9001")):
+        lists = Warehouse([list(column) for column in stacks])
+        start = time.perf_counter()
+        getattr(lists, run)(steps)
+        list_time = time.perf_counter() - start
+
+        ropes = RopeWarehouse.from_crates(stacks)
+        start = time.perf_counter()
+        getattr(ropes, run)(steps)
+        rope_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        replayed = replay_tops(stacks, steps, keep_order=name == "9001")
+        replay_time = time.perf_counter() - start
+
+        assert lists.tops() == ropes.tops() == replayed
+        print(
+            f"{name}: lists {list_time:.2f}s, ropes {rope_time:.2f}s,"
+            f" replay {replay_time:.3f}s"
+        )
+
+
+def test_replay_tops():
+    warehouse, instructions = parse(TEST_INPUT.splitlines())
+    original = [list(column) for column in warehouse.crates]
+
+    assert replay_tops(original, instructions, keep_order=False) == "CMZ"
+    assert replay_tops(original, instructions, keep_order=True) == "MCD"
+
+
+def test_streaming():
+    for keep_order, run in ((False, "run_9000"), (True, "run_9001")):
+        warehouse, instructions = parse(TEST_INPUT.splitlines())
+        getattr(warehouse, run)(instructions)
+
+        streamed = run_streaming(TEST_INPUT.splitlines(), keep_order)
+        assert streamed.crates == warehouse.crates
+
+
+def test_rope():
+    for run in ("run_9000", "run_9001"):
+        warehouse, instructions = parse(TEST_INPUT.splitlines())
+        ropes = RopeWarehouse.from_crates([list(column) for column in warehouse.crates])
+
+        getattr(warehouse, run)(instructions)
+        getattr(ropes, run)(instructions)
+
+        assert ropes.crates == warehouse.crates
+        assert ropes.tops() == warehouse.tops()
+
+
+def test_checkpoints():
+    for keep_order, move in ((False, "move_9000"), (True, "move_9001")):
+        warehouse, instructions = parse(TEST_INPUT.splitlines())
+        start = Warehouse.from_snapshot(warehouse.snapshot())
+        run = CheckpointedRun(start, instructions, keep_order, interval=2)
+
+        expected = [warehouse.tops()]
+        for instruction in instructions:
+            getattr(warehouse, move)(instruction)
+            expected.append(warehouse.tops())
+
+        assert run.advance(3).tops() == expected[3]
+        assert sorted(run.checkpoints) == [0, 2]
+
+        # behind the run is replayed from a checkpoint, ahead of it advances the run
+        for done in range(len(instructions) + 1):
+            assert run.tops_at(done) == expected[done]
+        assert sorted(run.checkpoints) == [0, 2, 4]
+        assert run.warehouse_at(len(instructions)).crates == warehouse.crates
+        assert start.tops() == expected[0]
+
+        # too small a budget for more than the start
+        tight = CheckpointedRun(start, instructions, keep_order, 1, memory_budget=1)
+        assert tight.advance().tops() == expected[-1]
+        assert list(tight.checkpoints) == [0]
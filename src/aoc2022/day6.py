@@ -1,33 +1,152 @@
-# could these be abstracted away from their hardcoded numbers? yes.
-# is it worth it? no. DRY only applies after you repeat yourself twice.
-def is_packet_marker(chars: str) -> bool:
-    assert len(chars) == 4, "stream window must be 4 characters"
-    return len(set(chars)) == 4
+import io
+from dataclasses import dataclass, field
+from typing import BinaryIO, Iterable, Iterator, TypeAlias
 
+from .common import input_buffer
 
-def is_message_marker(chars: str) -> bool:
-    assert len(chars) == 14, "stream window must be 14 characters"
-    return len(set(chars)) == 14
+Stream: TypeAlias = str | bytes | memoryview
 
+DEFAULT_CHUNK_SIZE = 64 * 1024
 
-def find_packet_marker_offset(stream: str) -> int:
-    for offset in range(0, len(stream) - 4 + 1):
-        start, end = offset, offset + 4
-        if is_packet_marker(stream[start:end]):
-            return end
+PACKET_MARKER_WIDTH = 4
+MESSAGE_MARKER_WIDTH = 14
+
+
+class _LastSeen(dict[int, int]):
+    "A last-seen table for characters that don't fit in a byte."
+
+    def __missing__(self, code: int) -> int:
+        return -1
+
+
+def _is_wide(stream: Stream) -> bool:
+    return isinstance(stream, str) and not stream.isascii()
+
+
+def _codes(stream: Stream) -> Iterable[int]:
+    """
+    The stream as one int per character, so offsets into a str are by character.
+    ASCII strs are scanned as their bytes, which is the same thing but faster.
+    """
+    if isinstance(stream, str):
+        return stream.encode("ascii") if stream.isascii() else map(ord, stream)
+    return stream
+
+
+@dataclass
+class MarkerScanner:
+    """
+    Finds markers in a stream fed to it a chunk at a time,
+    carrying the window over from one chunk to the next.
+
+    Keeps the last index each byte was seen at, so the window start only ever
+    moves forward and each byte is looked at once, whatever the width.
+    """
+
+    width: int
+
+    last_seen: list[int] | _LastSeen = field(
+        init=False, default_factory=lambda: [-1] * 256
+    )
+    "absolute index each byte (or character, once a wide one is fed) was last seen at"
+
+    start: int = field(init=False, default=0)
+    "absolute index of the start of the window of distinct bytes"
+
+    consumed: int = field(init=False, default=0)
+    "how many bytes have been fed so far"
+
+    def feed(self, chunk: Stream) -> Iterator[int]:
+        """
+        Yield the offset just past each marker ending in this chunk.
+        The search for the next marker starts after the previous one, so they don't overlap.
+
+        Finish iterating before feeding the next chunk.
+        """
+        if _is_wide(chunk) and isinstance(self.last_seen, list):
+            self.last_seen = _LastSeen(
+                (code, i) for code, i in enumerate(self.last_seen) if i != -1
+            )
+
+        last_seen, width = self.last_seen, self.width
+        start = self.start
+        for i, byte in enumerate(_codes(chunk), self.consumed):
+            if last_seen[byte] >= start:
+                start = last_seen[byte] + 1
+            last_seen[byte] = i
+
+            if i - start + 1 == width:
+                start = i + 1
+                yield start
+
+        self.start = start
+        self.consumed += len(chunk)
+
+
+def find_marker(stream: Stream, width: int) -> int:
+    "Offset just past the first `width` distinct characters in a row."
+    for offset in MarkerScanner(width).feed(stream):
+        return offset
 
     raise ValueError("stream did not include marker")
 
 
-def find_message_marker_offset(stream: str) -> int:
-    for offset in range(0, len(stream) - 14 + 1):
-        start, end = offset, offset + 14
-        if is_message_marker(stream[start:end]):
-            return end
+def find_markers(stream: Stream, widths: Iterable[int]) -> dict[int, int]:
+    """
+    The first marker offset for each width, from a single pass.
+
+    The run of distinct bytes ending at each index is the same whatever the width,
+    and only grows one at a time, so each width is found the first time the run reaches it.
+    """
+    pending = sorted(set(widths))
+    found: dict[int, int] = {}
+    if not pending:
+        return found
+
+    last_seen = _LastSeen() if _is_wide(stream) else [-1] * 256
+    start = 0
+    for i, byte in enumerate(_codes(stream)):
+        if last_seen[byte] >= start:
+            start = last_seen[byte] + 1
+        last_seen[byte] = i
+
+        if i - start + 1 == pending[len(found)]:
+            found[pending[len(found)]] = i + 1
+            if len(found) == len(pending):
+                return found
+
+    raise ValueError(f"stream did not include markers for {pending[len(found):]}")
+
+
+def scan_markers(
+    f: BinaryIO, width: int, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[int]:
+    """
+    Yield every marker offset in a binary file (or socket.makefile("rb")),
+    as soon as it's read, holding no more than one chunk at a time.
+    """
+    scanner = MarkerScanner(width)
+    while chunk := f.read(chunk_size):
+        yield from scanner.feed(chunk)
+
+
+def find_marker_in(
+    f: BinaryIO, width: int, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> int:
+    for offset in scan_markers(f, width, chunk_size):
+        return offset
 
     raise ValueError("stream did not include marker")
 
 
+def find_packet_marker_offset(stream: Stream) -> int:
+    return find_marker(stream, PACKET_MARKER_WIDTH)
+
+
+def find_message_marker_offset(stream: Stream) -> int:
+    return find_marker(stream, MESSAGE_MARKER_WIDTH)
+
+
 TEST_DATA = dict(
     mjqjpqmgbljsphdztnvjfqwrcgsmlb=(7, 19),
     bvwbjplbgvbhsrlpgdmjqwftvncz=(5, 23),
@@ -39,14 +158,41 @@ TEST_DATA = dict(
 
 
 def part1():
-    with open("inputs/day6.txt") as f:
-        stream = f.read().strip()
-
-    print(find_packet_marker_offset(stream))
+    print(find_packet_marker_offset(input_buffer()))
 
 
 def part2():
-    with open("inputs/day6.txt") as f:
-        stream = f.read().strip()
+    print(find_message_marker_offset(input_buffer()))
+
+
+def part1_and_2():
+    offsets = find_markers(input_buffer(), (PACKET_MARKER_WIDTH, MESSAGE_MARKER_WIDTH))
+
+    print(offsets[PACKET_MARKER_WIDTH])
+    print(offsets[MESSAGE_MARKER_WIDTH])
+
+
+def test():
+    for stream, (packet, message) in TEST_DATA.items():
+        assert find_packet_marker_offset(stream) == packet
+        assert find_message_marker_offset(stream) == message
+        assert find_marker(memoryview(stream.encode()), MESSAGE_MARKER_WIDTH) == message
+
+    for stream, (packet, message) in TEST_DATA.items():
+        # tiny chunks, so windows straddle chunk boundaries
+        f = io.BytesIO(stream.encode())
+        assert find_marker_in(f, MESSAGE_MARKER_WIDTH, chunk_size=3) == message
+
+    assert list(scan_markers(io.BytesIO(b"abcdabcdaaab"), 4, chunk_size=5)) == [4, 8]
+
+    for stream, (packet, message) in TEST_DATA.items():
+        offsets = find_markers(stream, (MESSAGE_MARKER_WIDTH, PACKET_MARKER_WIDTH))
+        assert offsets == {PACKET_MARKER_WIDTH: packet, MESSAGE_MARKER_WIDTH: message}
+
+    # offsets are by character, not by encoded byte
+    assert find_marker("ééab", 2) == 3
+    assert find_markers("ééabé", (2, 3)) == {2: 3, 3: 4}
 
-    print(find_message_marker_offset(stream))
+    scanner = MarkerScanner(3)
+    assert list(scanner.feed("aab")) == []
+    assert list(scanner.feed("éb")) == [4]
@@ -1,48 +1,126 @@
 from __future__ import annotations
+from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from typing import Generator, Iterable, Iterator, NamedTuple, Sequence, TypeAlias
 from functools import reduce
-from enum import Enum, auto
+from enum import Enum, IntEnum, auto
+from array import array
 import io
+import time
+import tracemalloc
+
+from .common import input
 
 Dir: TypeAlias = "dict[str, int | Dir]"
 Path: TypeAlias = tuple[str, ...]
 
+
+class _Shell(ABC):
+    "Drives a file system from a terminal transcript."
+
+    @abstractmethod
+    def cd(self, target: str):
+        "Change into target: a child dir, .. or /."
+
+    @abstractmethod
+    def mkdir(self, name: str):
+        "Create an empty dir in the cwd."
+
+    @abstractmethod
+    def fallocate(self, name: str, size: int):
+        "Create a file of the given size in the cwd."
+
+    def parse(self, input: Iterable[str]):
+        for line in input:
+            line = line.strip()
+            match line.split():
+                case "$", "cd", target:
+                    self.cd(target)
+                case "$", "ls":
+                    # the results are actually context-free, so we can skip this
+                    pass
+                case "dir", dirname:
+                    self.mkdir(dirname)
+                case size, name:
+                    self.fallocate(name, int(size))
+
+
+@dataclass(eq=False)
+class _DirNode:
+    "Bookkeeping for one dir, kept alongside its entry in FileSystem.children."
+
+    dir: Dir
+
+    subdirs: dict[str, _DirNode] = field(default_factory=dict)
+
+    size: int = 0
+    "cumulative size, apart from what's pending"
+
+    pending: int = 0
+    "size added at or below this dir while in the cwd, not yet added to size"
+
+
 # TODO: would this be better with an immutable walker?
 @dataclass
-class FileSystem:
+class FileSystem(_Shell):
     children: Dir = field(init=False, default_factory=dict)
     "int for file size, or dict of children if dir"
 
     context: list[str] = field(init=False, default_factory=list)
     "dirs relative to root (empty list)"
 
+    _root: _DirNode = field(init=False)
+
+    _cwd: list[_DirNode] = field(init=False)
+    "root and every dir in context, so the cwd never has to be looked up from root"
+
+    _dirty: bool = field(init=False, default=False)
+    "whether anything in _cwd has pending size, so lookups know to flush first"
+
+    def __post_init__(self):
+        self._root = _DirNode(self.children)
+        self._cwd = [self._root]
+
     @property
     def cur_dir(self) -> Dir:
-        cur = self.children
-        for part in self.context:
-            match cur.get(part):
-                case None:
-                    raise FileNotFoundError
-                case int():
-                    raise NotADirectoryError
-                case dict() as children:
-                    cur = children
-                case _:
-                    raise TypeError
-        return cur
+        return self._cwd[-1].dir
+
+    def _pop(self):
+        # sizes only travel up a level when leaving a dir,
+        # so adding a file doesn't have to touch every ancestor.
+        popped = self._cwd.pop()
+        popped.size += popped.pending
+        self._cwd[-1].pending += popped.pending
+        popped.pending = 0
+
+    def _flush(self):
+        if not self._dirty:
+            return
+
+        below = 0
+        for node in reversed(self._cwd):
+            below += node.pending
+            node.pending = 0
+            node.size += below
+        self._dirty = False
 
     def cd(self, target: str):
         match target:
             case "/":
                 self.context.clear()
+                while len(self._cwd) > 1:
+                    self._pop()
             case "..":
                 self.context.pop()
+                self._pop()
             case _:
-                self.context.append(target)
-                # just to check.
-                # this could be nicer. maybe related descriptors?
-                _ = self.cur_dir
+                if (node := self._cwd[-1].subdirs.get(target)) is not None:
+                    self._cwd.append(node)
+                    self.context.append(target)
+                elif target in self.cur_dir:
+                    raise NotADirectoryError
+                else:
+                    raise FileNotFoundError
 
     def mkdir(self, name: str):
         curdir = self.cur_dir
@@ -51,6 +129,7 @@ class FileSystem:
             raise FileExistsError(f"entry {name} already exists within {self.context}")
 
         curdir[name] = {}
+        self._cwd[-1].subdirs[name] = _DirNode(curdir[name])
 
     def fallocate(self, name: str, size: int):
         curdir = self.cur_dir
@@ -59,20 +138,40 @@ class FileSystem:
             raise FileExistsError(f"entry {name} already exists within {self.context}")
 
         curdir[name] = size
+        self._cwd[-1].pending += size
+        self._dirty = True
 
-    def parse(self, input: Iterable[str]):
-        for line in input:
-            line = line.strip()
-            match line.split():
-                case "$", "cd", target:
-                    self.cd(target)
-                case "$", "ls":
-                    # the results are actually context-free, so we can skip this
-                    pass
-                case "dir", dirname:
-                    self.mkdir(dirname)
-                case size, name:
-                    self.fallocate(name, int(size))
+    def size_of(self, path: Path) -> int:
+        self._flush()
+
+        node = self._root
+        for part in path:
+            node = node.subdirs[part]
+        return node.size
+
+    def all_dir_sizes(self) -> Iterator[int]:
+        "cumulative size of every dir, without working out their paths"
+        self._flush()
+
+        to_visit = [self._root]
+        while to_visit:
+            node = to_visit.pop()
+            yield node.size
+            to_visit.extend(node.subdirs.values())
+
+    @property
+    def dir_sizes(self) -> dict[Path, int]:
+        "cumulative size of every dir, by path"
+        self._flush()
+
+        sizes: dict[Path, int] = {}
+        to_visit: list[tuple[Path, _DirNode]] = [((), self._root)]
+        while to_visit:
+            path, node = to_visit.pop()
+            sizes[path] = node.size
+            to_visit.extend(((*path, name), sub) for name, sub in node.subdirs.items())
+
+        return sizes
 
     def __str__(self):
         buf = io.StringIO()
@@ -103,6 +202,199 @@ class FileSystem:
         return buf.getvalue()
 
 
+class InodeKind(IntEnum):
+    FILE = 0
+    DIR = 1
+
+
+ROOT = 0
+"root's inode"
+
+
+@dataclass
+class CompactFileSystem(_Shell):
+    """
+    The same as FileSystem, but stored as a flat table of inodes in parallel arrays
+    instead of nested dicts, for transcripts too big to hold as python objects.
+    """
+
+    parents: array[int] = field(init=False, default_factory=lambda: array("q", [-1]))
+    sizes: array[int] = field(init=False, default_factory=lambda: array("q", [0]))
+    "file size, or cumulative size of a dir (apart from what's pending)"
+    kinds: array[int] = field(
+        init=False, default_factory=lambda: array("b", [InodeKind.DIR])
+    )
+    names: array[int] = field(init=False, default_factory=lambda: array("q", [-1]))
+    "index into name_table"
+
+    name_table: list[str] = field(init=False, default_factory=list)
+    "every distinct name, stored once"
+
+    context: list[str] = field(init=False, default_factory=list)
+    "dirs relative to root (empty list)"
+
+    _name_ids: dict[str, int] = field(init=False, default_factory=dict)
+
+    _slots: array[int] = field(
+        init=False, default_factory=lambda: array("q", bytes(64))
+    )
+    "open addressing hash table of inode + 1 (0 is empty), keyed on (parent, name)"
+
+    _cwd: list[int] = field(init=False, default_factory=lambda: [ROOT])
+    _pending: list[int] = field(init=False, default_factory=lambda: [0])
+    "like _DirNode.pending, for each dir in _cwd"
+    _dirty: bool = field(init=False, default=False)
+
+    def _find(self, parent: int, name_id: int) -> int:
+        "The slot holding (parent, name), or the empty slot where it would go."
+        mask = len(self._slots) - 1
+        slot = hash((parent, name_id)) & mask
+        while (entry := self._slots[slot]) != 0:
+            inode = entry - 1
+            if self.parents[inode] == parent and self.names[inode] == name_id:
+                break
+            slot = (slot + 1) & mask
+        return slot
+
+    def _grow(self):
+        self._slots = array("q", bytes(16 * len(self._slots)))
+        for inode in range(ROOT + 1, len(self.parents)):
+            self._slots[self._find(self.parents[inode], self.names[inode])] = inode + 1
+
+    def lookup(self, parent: int, name: str) -> int | None:
+        if (name_id := self._name_ids.get(name)) is None:
+            return None
+        entry = self._slots[self._find(parent, name_id)]
+        return entry - 1 if entry else None
+
+    def _add(self, name: str, kind: InodeKind, size: int):
+        parent = self._cwd[-1]
+
+        if (name_id := self._name_ids.get(name)) is None:
+            name_id = self._name_ids[name] = len(self.name_table)
+            self.name_table.append(name)
+
+        slot = self._find(parent, name_id)
+        if self._slots[slot]:
+            raise FileExistsError(f"entry {name} already exists within {self.context}")
+
+        inode = len(self.parents)
+        self.parents.append(parent)
+        self.sizes.append(size)
+        self.kinds.append(kind)
+        self.names.append(name_id)
+        self._slots[slot] = inode + 1
+
+        if 2 * len(self.parents) > len(self._slots):
+            self._grow()
+
+    def _pop(self):
+        popped = self._cwd.pop()
+        pending = self._pending.pop()
+        self.sizes[popped] += pending
+        self._pending[-1] += pending
+
+    def _flush(self):
+        if not self._dirty:
+            return
+
+        below = 0
+        for level in reversed(range(0, len(self._cwd))):
+            below += self._pending[level]
+            self._pending[level] = 0
+            self.sizes[self._cwd[level]] += below
+        self._dirty = False
+
+    def cd(self, target: str):
+        match target:
+            case "/":
+                self.context.clear()
+                while len(self._cwd) > 1:
+                    self._pop()
+            case "..":
+                self.context.pop()
+                self._pop()
+            case _:
+                match self.lookup(self._cwd[-1], target):
+                    case None:
+                        raise FileNotFoundError
+                    case inode if self.kinds[inode] != InodeKind.DIR:
+                        raise NotADirectoryError
+                    case inode:
+                        self._cwd.append(inode)
+                        self._pending.append(0)
+                        self.context.append(target)
+
+    def mkdir(self, name: str):
+        self._add(name, InodeKind.DIR, 0)
+
+    def fallocate(self, name: str, size: int):
+        self._add(name, InodeKind.FILE, size)
+        self._pending[-1] += size
+        self._dirty = True
+
+    def size_of(self, path: Path) -> int:
+        self._flush()
+
+        inode = ROOT
+        for part in path:
+            if (inode := self.lookup(inode, part)) is None:
+                raise KeyError(path)
+        return self.sizes[inode]
+
+    def all_dir_sizes(self) -> Iterator[int]:
+        "cumulative size of every dir, without working out their paths"
+        self._flush()
+
+        for inode in range(ROOT, len(self.parents)):
+            if self.kinds[inode] == InodeKind.DIR:
+                yield self.sizes[inode]
+
+    @property
+    def dir_sizes(self) -> dict[Path, int]:
+        "cumulative size of every dir, by path"
+        self._flush()
+
+        # parents are always created before their children
+        paths: dict[int, Path] = {ROOT: ()}
+        for inode in range(ROOT + 1, len(self.parents)):
+            if self.kinds[inode] == InodeKind.DIR:
+                name = self.name_table[self.names[inode]]
+                paths[inode] = (*paths[self.parents[inode]], name)
+
+        return {path: self.sizes[inode] for inode, path in paths.items()}
+
+    def __str__(self):
+        buf = io.StringIO()
+
+        children: dict[int, list[int]] = {}
+        for inode in range(ROOT + 1, len(self.parents)):
+            children.setdefault(self.parents[inode], []).append(inode)
+
+        def name(inode: int) -> str:
+            return self.name_table[self.names[inode]]
+
+        def print_tree(dir: int, indent: int):
+            for inode in sorted(children.get(dir, []), key=name):
+                if self.kinds[inode] == InodeKind.FILE:
+                    print(
+                        " " * indent,
+                        "- ",
+                        name(inode),
+                        f" (file, size={self.sizes[inode]})",
+                        sep="",
+                        file=buf,
+                    )
+                else:
+                    print(" " * indent, "- ", name(inode), " (dir)", sep="", file=buf)
+                    print_tree(inode, indent + 2)
+
+        print("- / (dir)", file=buf)
+        print_tree(ROOT, 2)
+
+        return buf.getvalue()
+
+
 def _all_file_sizes_below(dir: Dir) -> Iterable[int]:
     for member in dir.values():
         if isinstance(member, int):
@@ -137,21 +429,14 @@ def _dir_size_depth_first(
     return this_dir_sum
 
 
-def sum_of_dirs_below_max(dir: Dir, path: tuple[str, ...]) -> int:
-    return sum(
-        (
-            size
-            for _, size in _dir_size_depth_first(dir, path)
-            if size < DIR_MAX_SIZE_TO_CONSIDER
-        )
-    )
+def sum_of_dirs_below_max(dir_sizes: Iterable[int]) -> int:
+    return sum((size for size in dir_sizes if size < DIR_MAX_SIZE_TO_CONSIDER))
 
 
 def part1():
     fs = FileSystem()
-    with open("inputs/day7.txt") as f:
-        fs.parse(f)
-    print(sum_of_dirs_below_max(fs.children, tuple()))
+    fs.parse(input())
+    print(sum_of_dirs_below_max(fs.all_dir_sizes()))
 
 
 TOTAL_DISK_SPACE = 70_000_000
@@ -159,25 +444,71 @@ NEEDED_FOR_UPDATE = 30_000_000
 
 
 def _deletion_candidates(
-    dir: Dir, current_available: int
-) -> Iterable[tuple[Path, int]]:
-    for path, size in _dir_size_depth_first(dir, tuple()):
+    dir_sizes: Iterable[int], current_available: int
+) -> Iterable[int]:
+    for size in dir_sizes:
         if size + current_available >= NEEDED_FOR_UPDATE:
-            yield path, size
+            yield size
 
 
-def smallest_that_fits(dir: Dir, current_available: int) -> int:
-    return min((size for _, size in _deletion_candidates(dir, current_available)))
+def smallest_that_fits(dir_sizes: Iterable[int], current_available: int) -> int:
+    return min(_deletion_candidates(dir_sizes, current_available))
 
 
 def part2():
     fs = FileSystem()
-    with open("inputs/day7.txt") as f:
-        fs.parse(f)
+    fs.parse(input())
+
+    used = fs.size_of(())
+
+    print(smallest_that_fits(fs.all_dir_sizes(), TOTAL_DISK_SPACE - used))
+
+
+def streaming_dir_sizes(input: Iterable[str]) -> Iterator[int]:
+    """
+    Yield every dir's total size as it's left, without building the tree,
+    so memory only grows with depth. Root comes last.
 
-    used = dir_size(fs.children)
+    Assumes each dir is only listed once, like the puzzle input.
+    """
+    totals: list[int] = [0]
 
-    print(smallest_that_fits(fs.children, TOTAL_DISK_SPACE - used))
+    def leave() -> int:
+        size = totals.pop()
+        totals[-1] += size
+        return size
+
+    for line in input:
+        match line.split():
+            case "$", "cd", "/":
+                while len(totals) > 1:
+                    yield leave()
+            case "$", "cd", "..":
+                yield leave()
+            case "$", "cd", _:
+                totals.append(0)
+            case ("$", "ls") | ("dir", _):
+                pass
+            case size, _:
+                totals[-1] += int(size)
+
+    while len(totals) > 1:
+        yield leave()
+    yield totals[0]
+
+
+def streaming_part1():
+    print(sum_of_dirs_below_max(streaming_dir_sizes(input(7))))
+
+
+def streaming_part2():
+    # one pass to find how much is used, since root is only known at the end,
+    # then another to find the smallest dir that would free up enough.
+    for used in streaming_dir_sizes(input(7)):
+        pass
+    current_available = TOTAL_DISK_SPACE - used
+
+    print(smallest_that_fits(streaming_dir_sizes(input(7)), current_available))
 
 
 class TEST:
@@ -210,3 +541,104 @@ $ ls
 5626152 d.ext
 7214296 k
 """
+
+
+def synthetic_transcript(depth: int, entries: int) -> Iterator[str]:
+    """
+    A chain of nested dirs `depth` deep, with the given number of entries spread across them,
+    then climbing back out to root.
+    """
+    per_dir = max(entries // depth, 1)
+
+    yield "$ cd /"
+    for level in range(0, depth):
+        yield "$ ls"
+        yield f"dir d{level}"
+        for file in range(0, per_dir - 1):
+            yield f"{file + 1} f{file}"
+        yield f"$ cd d{level}"
+
+    for _level in range(0, depth):
+        yield "$ cd .."
+
+
+def bench_parse(depth: int = 10_000, entries: int = 1_000_000):
+    lines = list(synthetic_transcript(depth, entries))
+
+    fs = FileSystem()
+    start = time.perf_counter()
+    fs.parse(lines)
+    elapsed = time.perf_counter() - start
+
+    print(f"parsed {len(lines)} lines at depth {depth} in {elapsed:.2f}s")
+    print(f"root size: {fs.size_of(())}")
+
+    start = time.perf_counter()
+    below_max = sum_of_dirs_below_max(fs.all_dir_sizes())
+    elapsed = time.perf_counter() - start
+    print(f"summed dirs below max ({below_max}) in {elapsed:.2f}s")
+
+    # left at the bottom, so a lookup would have the whole cwd to flush if anything changed
+    deep = FileSystem()
+    deep.parse(lines[:-depth])
+    lookups = 10_000
+    start = time.perf_counter()
+    for _ in range(0, lookups):
+        deep.size_of(())
+    elapsed = time.perf_counter() - start
+    print(f"{lookups} root size lookups at depth {depth} in {elapsed:.3f}s")
+
+
+def bench_memory(depth: int = 100, entries: int = 1_000_000):
+    "Compare memory held by FileSystem and CompactFileSystem for the same transcript."
+    for cls in (FileSystem, CompactFileSystem):
+        tracemalloc.start()
+        fs = cls()
+        fs.parse(synthetic_transcript(depth, entries))
+        used, _peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f"{cls.__name__}: {used / 2**20:.1f}MiB, root size {fs.size_of(())}")
+
+
+def test():
+    fs = FileSystem()
+    fs.parse(TEST.DATA.splitlines())
+
+    assert fs.size_of(()) == dir_size(fs.children) == TEST.ROOT_SIZE
+
+    # looked up partway, then added to, so it has to flush again
+    for cls in (FileSystem, CompactFileSystem):
+        partway = cls()
+        lines = TEST.DATA.splitlines()
+        partway.parse(lines[:-1])
+        assert partway.size_of(()) == partway.size_of(()) == TEST.ROOT_SIZE - 7_214_296
+        partway.parse(lines[-1:])
+        assert partway.size_of(()) == TEST.ROOT_SIZE
+    assert fs.dir_sizes == dict(_dir_size_depth_first(fs.children, ()))
+    assert sorted(fs.all_dir_sizes()) == sorted(fs.dir_sizes.values())
+    assert sum_of_dirs_below_max(fs.all_dir_sizes()) == TEST.SUM_OF_DIRS_BELOW_MAX
+    assert smallest_that_fits(fs.all_dir_sizes(), TEST.AVAILABLE) == 24_933_642
+
+    class Incomplete(_Shell):
+        def cd(self, target: str):
+            pass
+
+    try:
+        Incomplete()
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("a shell missing methods shouldn't be creatable")
+
+    compact = CompactFileSystem()
+    compact.parse(TEST.DATA.splitlines())
+
+    assert str(compact) == str(fs)
+    assert compact.dir_sizes == fs.dir_sizes
+    assert sorted(compact.all_dir_sizes()) == sorted(fs.all_dir_sizes())
+    assert compact.size_of(("a", "e")) == fs.size_of(("a", "e")) == 584
+
+    assert sorted(streaming_dir_sizes(TEST.DATA.splitlines())) == sorted(
+        fs.dir_sizes.values()
+    )
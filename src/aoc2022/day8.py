@@ -1,7 +1,8 @@
 from __future__ import annotations
-from .common import input, Vector
+from .common import input, input_buffer, Vector
 from dataclasses import dataclass, field, replace
 from typing import (
+    TYPE_CHECKING,
     NamedTuple,
     Self,
     overload,
@@ -20,6 +21,11 @@ from functools import reduce
 import operator
 from textwrap import dedent
 from itertools import product
+import random
+import time
+
+if TYPE_CHECKING:
+    import numpy as np
 
 # TODO: much of this was overcomplicated because I misidentified the problem in visible_in_dimension.
 
@@ -261,6 +267,136 @@ def part1():
     print(sum(1 for _ in all_visible(forest)))
 
 
+class ForestArray(NamedTuple):
+    "A forest as one uint8 array of heights, row-major like `SquareGrid`."
+
+    heights: np.ndarray
+
+    @classmethod
+    def parse(cls, buf: bytes | memoryview) -> ForestArray:
+        """
+        Read a whole file of digit rows straight into an array,
+        using the row length to reshape it rather than splitting lines.
+        """
+        import numpy as np
+
+        data = np.frombuffer(buf, dtype=np.uint8)
+        if not len(data):
+            return cls(np.zeros((0, 0), dtype=np.uint8))
+
+        newlines = np.flatnonzero(data == ord("\n"))
+        stride = int(newlines[0]) + 1 if len(newlines) else len(data) + 1
+        width = stride - 1
+        if width and data[width - 1] == ord("\r"):
+            width -= 1
+
+        if data[-1] != ord("\n"):
+            # finish the last row with the same line ending as the others
+            ending = data[width:stride] if len(newlines) else np.array([ord("\n")])
+            data = np.concatenate((data, ending.astype(np.uint8)))
+
+        if len(data) % stride:
+            raise ValueError("rows must all be the same length")
+
+        heights = data.reshape(-1, stride)[:, :width] - np.uint8(ord("0"))
+        if heights.shape[0] != width:
+            raise ValueError(f"forest isn't square: {heights.shape}")
+        if (heights > 9).any():
+            raise ValueError("heights must be single digits")
+
+        return cls(heights)
+
+    @classmethod
+    def from_forest(cls, forest: Forest) -> ForestArray:
+        import numpy as np
+
+        return cls(
+            np.array(forest.rows, dtype=np.uint8).reshape(len(forest), len(forest))
+        )
+
+    def visible_mask(self) -> np.ndarray:
+        """
+        Whether each tree can be seen from outside, like `all_visible`.
+        A tree is visible from a side if it's taller than the running max
+        of everything before it, which is one `maximum.accumulate` per side.
+        """
+        import numpy as np
+
+        heights = self.heights
+        visible = np.ones(heights.shape, dtype=bool)
+        if min(heights.shape) <= 2:
+            return visible
+
+        inner = visible[1:-1, 1:-1]
+        inner[...] = False
+
+        for axis in (0, 1):
+            for forward in (True, False):
+                line = heights if forward else np.flip(heights, axis)
+                tallest = np.maximum.accumulate(line, axis=axis)
+                if axis == 0:
+                    seen = line[1:-1, 1:-1] > tallest[:-2, 1:-1]
+                else:
+                    seen = line[1:-1, 1:-1] > tallest[1:-1, :-2]
+
+                inner |= seen if forward else np.flip(seen, axis)
+
+        return visible
+
+    def visible_count(self) -> int:
+        return int(self.visible_mask().sum())
+
+    def visible(self) -> set[Vector]:
+        "The same coordinates `all_visible` would give."
+        import numpy as np
+
+        return {Vector(int(x), int(y)) for y, x in np.argwhere(self.visible_mask())}
+
+
+def part1_array():
+    print(ForestArray.parse(input_buffer()).visible_count())
+
+
+def synthetic_forest(size: int, seed: int = 0) -> bytes:
+    "A square forest of random heights, in the input format."
+    rng = random.Random(seed)
+    return b"".join(
+        bytes(rng.choices(b"0123456789", k=size)) + b"\n" for _row in range(size)
+    )
+
+
+def bench_visibility(size: int = 300, array_size: int = 10_000):
+    """
+    Compare the two part 1 paths on a forest both can handle,
+    then time the array path alone on a much bigger one.
+    """
+    data = synthetic_forest(size)
+
+    start = time.perf_counter()
+    expected = len(all_visible(Forest.parse(data.decode().splitlines())))
+    object_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    count = ForestArray.parse(data).visible_count()
+    array_time = time.perf_counter() - start
+
+    assert count == expected
+    print(f"{size}x{size}: objects {object_time:.2f}s, array {array_time:.3f}s")
+
+    import numpy as np
+
+    rows = np.random.default_rng(0).integers(
+        ord("0"), ord("9") + 1, size=(array_size, array_size + 1), dtype=np.uint8
+    )
+    rows[:, -1] = ord("\n")
+    data = rows.tobytes()
+
+    start = time.perf_counter()
+    count = ForestArray.parse(data).visible_count()
+    array_time = time.perf_counter() - start
+    print(f"{array_size}x{array_size}: array {array_time:.2f}s ({count} visible)")
+
+
 def scenic_score_for(forest: Forest, tree: TreeWithHeight) -> int:
     score = 1
 
@@ -314,3 +450,15 @@ def top_score(forest: Forest) -> tuple[Vector, int]:
 def part2():
     forest = Forest.parse(input())
     print(top_score(forest)[1])
+
+
+def test_array():
+    forest = Forest.parse(TEST.DATA.splitlines())
+    # the rows in DATA keep their indentation, which Forest.parse strips
+    array = ForestArray.parse(
+        "\n".join(row.strip() for row in TEST.DATA.splitlines()).encode()
+    )
+
+    assert (array.heights == ForestArray.from_forest(forest).heights).all()
+    assert array.visible() == all_visible(forest)
+    assert array.visible_count() == 21